@@ -1,24 +1,68 @@
-import csv
 import sys
 from datetime import datetime
-import pytz
+
+BUFFER_SIZE = 1 << 20
+
+def days_from_civil(year, month, day):
+    # Days since 1970-01-01 of a proleptic Gregorian date, using Howard
+    # Hinnant's days_from_civil algorithm (integer arithmetic only)
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def iso_to_epoch(value):
+    # 'YYYY-MM-DD HH:MM:SS' followed by 'Z' or a '+HH:MM'/'-HH:MM' offset is
+    # converted with fixed slices and integer math. Anything else (naive
+    # local times, fractional seconds, ...) goes through datetime
+    tz = value[19:]
+    if tz == 'Z':
+        offset = 0
+    elif len(tz) == 6 and tz[0] in '+-' and tz[3] == ':':
+        offset = int(tz[1:3]) * 3600 + int(tz[4:6]) * 60
+        if tz[0] == '-':
+            offset = -offset
+    else:
+        return int(datetime.fromisoformat(value).timestamp())
+
+    days = days_from_civil(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    return (days * 86400 + int(value[11:13]) * 3600 + int(value[14:16]) * 60
+            + int(value[17:19]) - offset)
 
 def convert_dates_to_timestamps(input_file):
-    reader = csv.reader(open(input_file, 'r'))
-    writer = csv.writer(sys.stdout)
-
-    # Read and write the header
-    header = next(reader)
-    writer.writerow(header)
-
-    # Process each row
-    for row in reader:
-        if row and row[0]:
-            # Parse the datetime with timezone
-            dt = datetime.fromisoformat(row[0])
-            timestamp = int(dt.timestamp())
-            row[0] = str(timestamp)
-        writer.writerow(row)
+    # Only the first column changes: split each line on its first comma and
+    # copy the rest of the line as is, no CSV parsing needed (the date column
+    # is never quoted). Input and output use large buffers
+    with open(input_file, 'r', buffering=BUFFER_SIZE, newline='') as infile, \
+         open(sys.stdout.fileno(), 'w', buffering=BUFFER_SIZE,
+              newline='', closefd=False) as out:
+        # Copy the header
+        out.write(next(infile))
+
+        # Timestamps keyed by date string, so repeated dates are converted once.
+        # Values that are not dates are mapped to themselves
+        cache: dict[str, str] = {}
+        for line in infile:
+            # Split the line ending off first, so a single-column row keeps
+            # it out of the date. Blank lines and values that are not dates
+            # are written back unchanged
+            content = line.rstrip('\r\n')
+            value, sep, rest = content.partition(',')
+            if value:
+                timestamp = cache.get(value)
+                if timestamp is None:
+                    try:
+                        timestamp = str(iso_to_epoch(value))
+                    except ValueError:
+                        timestamp = value
+                    cache[value] = timestamp
+                value = timestamp
+            out.write(value)
+            out.write(sep)
+            out.write(rest)
+            out.write(line[len(content):])
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -26,4 +70,3 @@ if __name__ == "__main__":
         sys.exit(1)
 
     convert_dates_to_timestamps(sys.argv[1])
-
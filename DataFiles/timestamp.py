@@ -1,21 +1,28 @@
-import csv
 import sys
-from datetime import datetime
+from dateutil.tz import tzlocal
+import pandas as pd
+
+BUFFER_SIZE = 1 << 20
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 def convert_timestamps(input_file):
-    reader = csv.reader(open(input_file, 'r'))
-    writer = csv.writer(sys.stdout)
+    # Read every column as text so that everything but the timestamp column
+    # is written back untouched. The input is read in large blocks. Blank
+    # lines are dropped: kept, pandas would write them back as rows of
+    # empty fields (',,,') rather than as blank lines
+    with open(input_file, 'r', buffering=BUFFER_SIZE, newline='') as infile:
+        df = pd.read_csv(infile, dtype=str, keep_default_na=False)
+    timestamp_column = df.columns[0]
 
-    # Read and write the header
-    header = next(reader)
-    writer.writerow(header)
+    # Convert and format the whole timestamp column in vectorized calls,
+    # in local time like datetime.fromtimestamp()
+    timestamps = df[timestamp_column]
+    valid = timestamps.str.isdigit()
+    dates = pd.to_datetime(timestamps[valid].astype('int64'), unit='s', utc=True)
+    df.loc[valid, timestamp_column] = dates.dt.tz_convert(tzlocal()).dt.strftime(DATE_FORMAT)
 
-    # Process each row
-    for row in reader:
-        if row and row[0].isdigit():
-            timestamp = int(row[0])
-            row[0] = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-        writer.writerow(row)
+    # CRLF line endings, as csv.writer wrote them
+    df.to_csv(sys.stdout, index=False, lineterminator='\r\n')
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -23,4 +30,3 @@ if __name__ == "__main__":
         sys.exit(1)
 
     convert_timestamps(sys.argv[1])
-
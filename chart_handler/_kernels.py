@@ -0,0 +1,65 @@
+"""Numeric kernels used by the chart handler"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, see rolling_smas below
+    njit = None
+
+
+###############################################################################
+def _rolling_sma_loop(close: np.ndarray, period: int, out: np.ndarray):
+    """Running-sum SMA loop writing into the preallocated `out` array,
+    compiled with numba when it is available. `out[:period - 1]` is left
+    untouched.
+    """
+    n = close.shape[0]
+    if n < period:
+        return
+    total = 0.0
+    for i in range(period):
+        total += close[i]
+    out[period - 1] = total / period
+    for i in range(period, n):
+        total += close[i] - close[i - period]
+        out[i] = total / period
+
+###############################################################################
+def _rolling_smas_cumsum(close: np.ndarray, periods) -> tuple:
+    """SMAs of every period from a single cumulative sum of `close`.
+
+    The sum of a window is the difference of two cumulative sums, so one
+    cumsum is shared by all the periods.
+    """
+    n = close.shape[0]
+    csum = np.empty(n + 1)
+    csum[0] = 0.0
+    np.cumsum(close, out=csum[1:])
+    smas = []
+    for period in periods:
+        out = np.full(n, np.nan)
+        if n >= period:
+            out[period - 1:] = (csum[period:] - csum[:-period]) / period
+        smas.append(out)
+    return tuple(smas)
+
+###############################################################################
+def _rolling_smas_jit(close: np.ndarray, periods) -> tuple:
+    """SMAs of every period with the compiled running-sum loop."""
+    smas = []
+    for period in periods:
+        out = np.full(close.shape[0], np.nan)
+        _rolling_sma_nb(close, period, out)
+        smas.append(out)
+    return tuple(smas)
+
+###############################################################################
+# rolling_smas(close, periods) -> tuple of np.ndarray
+# Simple Moving Averages of the float64 `close` array, one per period in
+# `periods`, NaN where less than `period` bars are available. Compiled
+# running-sum loop with numba, shared cumulative sum without it.
+if njit is not None:
+    _rolling_sma_nb = njit(cache=True, nogil=True, fastmath=True)(_rolling_sma_loop)
+    rolling_smas = _rolling_smas_jit
+else:
+    rolling_smas = _rolling_smas_cumsum
@@ -1,20 +1,66 @@
 """ Chart Handler Module"""
-from typing import Dict, List
+from typing import Dict
 #import queue
+import functools
+import logging
 import time
+from threading import RLock, Thread
 
 from ibapi.contract import Contract
 from ibapi.order import Order
-from lightweight_charts import Chart  # Assuming lightweight_charts is used
+import numpy as np
 import pandas as pd
+from chart_handler._kernels import rolling_smas
 from signals_handler import signals_handler
 from shared.queue_manager import data_queue  # Import shared queue
 
 # Import default configuration
 from shared import config
-from shared.logger import log
+from shared.logger import log, logger
+
+# Bar fields received from the queue and the dtype of their column buffer
+BAR_COLUMNS = {
+    'date': 'datetime64[ns]',
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64,
+}
+# Columns of the bars sent to the chart
+BAR_FIELDS = list(BAR_COLUMNS)
+# Initial number of bars the column buffers can hold, doubled when full
+INITIAL_BARS_CAPACITY = 1024
+# Background color of the PL cell, indexed by PL > 0
+PL_COLORS = ('red', 'green')
+# SMA periods and their column names, read from the configuration once
+SMA_PERIODS = (config.SMA_SHORT_PERIOD, config.SMA_LONG_PERIOD)
+SMA_COLUMNS = tuple(f'SMA_{period}' for period in SMA_PERIODS)
+# Number of closes needed to compute the SMA of one more bar
+SMA_LOOKBACK = max(SMA_PERIODS)
 
 
+###############################################################################
+@functools.lru_cache(maxsize=512)
+def _make_contract(symbol: str, sec_type: str, exchange: str, currency: str) -> Contract:
+    """Build a contract, cached so repeated requests share the same object."""
+    contract = Contract()
+    contract.symbol = symbol
+    contract.secType = sec_type
+    contract.exchange = exchange
+    contract.currency = currency
+    return contract
+
+###############################################################################
+def _make_market_order(action: str, quantity: int) -> Order:
+    """Build a market order. Not cached: ibapi and callers may modify the
+    order once placed, so each order gets its own object."""
+    order = Order()
+    order.orderType = "MKT"
+    order.totalQuantity = quantity
+    order.action = action
+    return order
+
 ###############################################################################
 class ChartHandler:
     """Handles chart creation and updates using lightweight_charts.
@@ -30,6 +76,10 @@ class ChartHandler:
         Sets up the chart with a toolbox, legend, and top bar for symbol and
         timeframe selection.
         """
+        # Imported here, lightweight_charts pulls in pywebview and its GUI
+        # backend, only needed once a chart is actually created
+        from lightweight_charts import Chart
+
         self.chart = Chart(toolbox=True,
                            width=1000,
                            inner_width=0.7,
@@ -61,6 +111,23 @@ class ChartHandler:
         self.sma_short_line = None
         self.sma_long_line = None
         self.realtime_data_req_id = None
+        # Received bars, stored column by column (one numpy buffer per field)
+        self._columns = {name: np.empty(INITIAL_BARS_CAPACITY, dtype=dtype)
+                         for name, dtype in BAR_COLUMNS.items()}
+        # SMA of the received bars, kept along the bars so that only the SMA
+        # of the new bars is computed on updates
+        self._sma_columns = {
+            name: np.empty(INITIAL_BARS_CAPACITY, dtype=np.float64)
+            for name in SMA_COLUMNS}
+        self._bars_count = 0
+        # (symbol, timeframe) of the bars currently displayed on the chart
+        self._displayed_data = None
+        # Current spinner state and watermark, to skip redundant UI updates
+        self._spinner_on = False
+        self._watermark = None
+        # The chart is updated from the chart worker, IB API and tick
+        # threads, each update holds this lock so they do not interleave
+        self._chart_lock = RLock()
         # Create a table to display portfolio data
         self.table = self.chart.create_table(
             width=0.3, height=0.2,
@@ -68,6 +135,11 @@ class ChartHandler:
             widths=(0.2, 0.1, 0.2, 0.2, 0.3),
             alignments=('center', 'center', 'right', 'right', 'right'),
             position='left', func=self. on_row_click)
+        # Chart updates run on a dedicated worker thread, woken up by
+        # new data in the shared queue or by update_chart(). Requests
+        # arriving while it is busy are coalesced.
+        self._chart_thread = Thread(target=self._chart_loop, daemon=True)
+        self._chart_thread.start()
 
     ###########################################################################
     def set_client(self, client):
@@ -78,6 +150,26 @@ class ChartHandler:
         """
         self.client = client
 
+    ###########################################################################
+    def set_spinner(self, on: bool):
+        """Shows or hides the chart spinner, only when its state changes.
+
+        Args:
+            on (bool): True to show the spinner, False to hide it.
+        """
+        with self._chart_lock:
+            if on != self._spinner_on:
+                self.chart.spinner(on)
+                self._spinner_on = on
+
+    ###########################################################################
+    def set_watermark(self, text: str):
+        """Sets the chart watermark, unless it already shows `text`."""
+        with self._chart_lock:
+            if text != self._watermark:
+                self.chart.watermark(text)
+                self._watermark = text
+
     ###########################################################################
     def on_realtime_selection(self, chart):
         """Callback function for when realtime chart data is requested.
@@ -135,45 +227,57 @@ class ChartHandler:
         self.chart.topbar['symbol'].set(row['symbol'])
         self.request_historical_data(row['symbol'], config.DEFAULT_TIMEFRAME)
         row['PL'] = round(row['PL']+1, 2)
-        row.background_color('PL', 'green' if row['PL'] > 0 else 'red')
+        row.background_color('PL', PL_COLORS[int(row['PL'] > 0)])
         self.table.footer[1] = row['symbol']
 
     ###########################################################################
-    def update_data_with_sma(self, period: int, bars: List[Dict], data: Dict) -> Dict:
+    def append_bars(self, bars: Dict[str, np.ndarray]):
         """
-        Update received data bars adding a column for the SMA of the  given period
+        Append received bars to the column buffers, growing them when full.
         Args:
-            period (int): The period over which to calculate the SMA.
-            bars (Lis[Dict]): the current list of received data bars.
-            data (Dict): the last received bars still to append.
-
-        Returns:
-            data (Dict): the last received bar with the added new SMA column for
-                         the given period.
+            bars (Dict[str, np.ndarray]): the received bars, one array per
+                        field (date, open, high, low, close and volume).
         """
-       
-        log('debug', "calculate SMA %d", period)
-        temp_bars = bars + [data]
-        temp_df   = pd.DataFrame(temp_bars)
-        if len(temp_df) >= period:
-            sma_value = temp_df['close'].rolling(window=period).mean().iloc[-1]
-            data[f'SMA_{period}'] = round(sma_value, 2)
-        else:
-            log('warning', "Not enough data to calculate SMA_%d", period)
-            # If not enough data, set SMA to None or NaN
-            data[f'SMA_{period}'] = None
+        start = self._bars_count
+        end = start + len(bars['close'])
+        capacity = len(self._columns['close'])
+        if end > capacity:
+            while capacity < end:
+                capacity *= 2
+            for columns in (self._columns, self._sma_columns):
+                for name, column in columns.items():
+                    columns[name] = np.resize(column, capacity)
+        for name, column in self._columns.items():
+            column[start:end] = bars[name]
+        self._bars_count = end
 
-        log('debug', "SMA_%d value: %s", period, data[f'SMA_{period}'])
+    ###########################################################################
+    def calculate_smas(self, close: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Calculate the short and long period SMAs with the `rolling_smas`
+        kernel, which shares one cumulative sum between both periods.
+        Args:
+            close (np.ndarray): the close prices of the received bars.
 
-        # Return the updated data with the new SMA column
-        return data
+        Returns:
+            Dict[str, np.ndarray]: the SMA_<period> columns rounded to 2
+                                   decimals, NaN for the first period-1 bars.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            log('debug', "calculate SMA %s", SMA_PERIODS)
+        for period in SMA_PERIODS:
+            if len(close) < period:
+                log('warning', "Not enough data to calculate SMA_%d", period)
+        return {name: np.round(sma, 2)
+                for name, sma in zip(SMA_COLUMNS, rolling_smas(close, SMA_PERIODS))}
 
     ###########################################################################
     def show_sma_line(self, period: str, color: str, line_attr_name, df: pd.DataFrame):
         """Displays the Simple Moving Average (SMA) on the chart."""
 
         line_attr = getattr(self, line_attr_name, None)
-        log('debug', "Showing SMA for period: %s", period)
+        if logger.isEnabledFor(logging.DEBUG):
+            log('debug', "Showing SMA for period: %s", period)
         sma_column = f'SMA_{period}'
 
         if sma_column not in df.columns:
@@ -199,56 +303,161 @@ class ChartHandler:
 
     ###########################################################################
     def update_chart(self):
+        """Schedules a chart update with the new data from the queue.
+
+        The update itself runs on the chart worker thread, so the caller
+        (typically the IB API thread) is not blocked while it executes.
+        """
+        data_queue.notify()
+
+    ###########################################################################
+    def _chart_loop(self):
+        """Chart worker thread: runs a chart update each time one is scheduled."""
+        while True:
+            data_queue.wait()
+            try:
+                with self._chart_lock:
+                    self._refresh_chart()
+            except Exception as e:
+                log('error', "Error updating chart: %s", e)
+
+    ###########################################################################
+    def _refresh_chart(self):
         """Updates the chart with new data from the queue.
 
         Retrieves available data from the queue, converts it to a pandas DataFrame,
         and updates the chart.
         """
-        bars = []
-
+        # Check the level once for the whole update
+        debug = logger.isEnabledFor(logging.DEBUG)
         try:
             log('info', "Updating chart with new data from the queue.")
-            self.chart.spinner(True)
-            # Drain the queue
-            while not data_queue.empty():
-                data = data_queue.get_nowait()
-                log('debug', "Received data from the queue: %s", data)
-                self.update_data_with_sma(config.SMA_SHORT_PERIOD, bars, data)
-                self.update_data_with_sma(config.SMA_LONG_PERIOD, bars, data)
-                bars.append(data)
-
-                # Create markers BUY or SELL bases on some calculations
-                signals_handler.buy_or_sell_based_on_signals(bars)
-
-            # Convert to DataFrame
-            df = pd.DataFrame(bars)
+            # Drain the items queued so far, the ones appended meanwhile are
+            # left for the next update. Each item holds the (symbol,
+            # timeframe) of a historical data request and its bars, one
+            # array per field
+            items = data_queue.drain()
+            if not items:
+                return
+            # Only the bars of the most recent request are drawn, the ones
+            # of an earlier request queued before it are outdated
+            data_key = items[-1][0]
+            batches = [batch for key, batch in items if key == data_key]
+            bars = {name: np.concatenate([batch[name] for batch in batches])
+                    for name in self._columns}
+            if debug:
+                log('debug', "Received %d bars from the queue", len(bars['close']))
+
+            # Store the bars column by column. When the chart already shows
+            # the same symbol and timeframe, keep the displayed bars and only
+            # append the new ones
+            start = 0
+            if self._displayed_data == data_key and self._bars_count:
+                last_date = self._columns['date'][self._bars_count - 1]
+                # The last displayed bar is replaced, it may have changed since
+                new_bars = bars['date'] >= last_date
+                if not new_bars.any():
+                    log('info', "No new bars to display.")
+                    return
+                bars = {name: column[new_bars] for name, column in bars.items()}
+                start = self._bars_count - 1
+            self._bars_count = start
+            self.append_bars(bars)
+            end = self._bars_count
+
+            # Only compute the SMA of the appended bars, from their closes and
+            # the ones of the longest period before them, so the cost of an
+            # update does not grow with the chart history
+            lookback = max(start - SMA_LOOKBACK + 1, 0)
+            smas = self.calculate_smas(self._columns['close'][lookback:end])
+            for name, sma in smas.items():
+                self._sma_columns[name][start:end] = sma[start - lookback:]
+
+            columns = {name: column[:end]
+                       for name, column in self._columns.items()}
+            columns.update({name: column[:end]
+                            for name, column in self._sma_columns.items()})
+
+            # Wrap the columns in a DataFrame without copying them
+            df = pd.DataFrame(columns, copy=False)
+
+            # Create markers BUY or SELL bases on some calculations
+            signals_handler.buy_or_sell_based_on_signals(df)
+
+            if start:
+                # Only send the new bars to the chart
+                self.update_chart_tail(df, start)
+                return
 
             # Update chart
-            # This uses columns: date/time, open, high, low, close, volume
-            self.chart.set(df)
-            log('debug', "Show SMA %s line", config.SMA_SHORT_PERIOD)
+            # This uses columns: date/time, open, high, low, close, volume.
+            # The SMA columns are left out: chart.set() would serialize them
+            # with every candle and volume bar and set the SMA lines, which
+            # show_sma_line() does below
+            self.chart.set(df[BAR_FIELDS])
+            self._displayed_data = data_key
+            if debug:
+                log('debug', "Show SMA %s line", config.SMA_SHORT_PERIOD)
             self.show_sma_line(config.SMA_SHORT_PERIOD,
                                config.SMA_SHORT_COLOR,
                                "sma_short_line", df)
-            log('debug', "Show SMA %s line", config.SMA_LONG_PERIOD)
+            if debug:
+                log('debug', "Show SMA %s line", config.SMA_LONG_PERIOD)
             self.show_sma_line(config.SMA_LONG_PERIOD,
                                config.SMA_LONG_COLOR,
                                "sma_long_line", df)
-        except data_queue.empty():
-            log('warning',"Queue was unexpectedly empty.")
         finally:
-            self.chart.spinner(False)
+            self.set_spinner(False)
+
+    ###########################################################################
+    def update_chart_tail(self, df: pd.DataFrame, start: int):
+        """Updates the chart and SMA lines with the bars of `df` from `start`,
+        the previous ones being already displayed.
+
+        Args:
+            df (pd.DataFrame): all the bars with their SMA columns.
+            start (int): index of the first bar to send to the chart.
+        """
+        log('info', "Updating chart with %d new bars.", len(df) - start)
+        # Read the column arrays directly, the chart only needs the bar
+        # fields and each SMA value, not a copy of the whole DataFrame row
+        # (dates through .array, which yields pd.Timestamp as the rows did)
+        bar_columns = [df[name].array if name == 'date' else df[name].to_numpy()
+                       for name in BAR_FIELDS]
+        dates = bar_columns[0]
+        sma_lines = tuple((sma_column, df[sma_column].to_numpy(), line)
+                          for sma_column, line in zip(SMA_COLUMNS,
+                                                      (self.sma_short_line,
+                                                       self.sma_long_line))
+                          if line)
+        for i in range(start, len(df)):
+            self.chart.update(pd.Series(
+                {name: column[i] for name, column in zip(BAR_FIELDS, bar_columns)}))
+            for sma_column, sma, line in sma_lines:
+                if not np.isnan(sma[i]):
+                    line.update(pd.Series({'time': dates[i],
+                                           sma_column: sma[i]}))
+
+    ###########################################################################
+    def update_from_tick(self, tick: dict):
+        """Updates the last bar of the chart with a real-time tick.
+
+        Args:
+            tick (dict): the tick 'time' and 'price'. It is only wrapped in
+                         the pd.Series expected by the chart here.
+        """
+        with self._chart_lock:
+            self.chart.update_from_tick(pd.Series(tick))
 
     ###########################################################################
     def create_contract(self, symbol: str , sec_type: str, exchange: str, currency: str):
 
-        """Create a contract object"""
-        contract = Contract()
-        contract.symbol = symbol
-        contract.secType = sec_type
-        contract.exchange = exchange
-        contract.currency = currency
-        return contract
+        """Create a contract object.
+
+        Contracts are cached and shared between requests, the returned
+        object must not be modified.
+        """
+        return _make_contract(symbol, sec_type, exchange, currency)
 
     ###########################################################################
     def request_historical_data(self, symbol: str, timeframe: str):
@@ -264,9 +473,9 @@ class ChartHandler:
             return None
         try:
             log('info',"Requesting bar data for %s %s %s", symbol, timeframe, config.DEFAULT_HISTORICAL_DURATION)
-            self.chart.spinner(True)
+            self.set_spinner(True)
 
-            data_queue.queue.clear()
+            data_queue.clear()
 
             # Create a contract object for the stock symbol
             contract = self.create_contract(symbol,
@@ -277,6 +486,8 @@ class ChartHandler:
             # Request historical data from IB API
             # The request will return data in the format specified by the 'barSizeSetting'
             req_id = self.client.get_next_req_id() # Any unique integer ID for tracking
+            historical_data_done = self.client.expect_historical_data(
+                req_id, (symbol, timeframe))
             self.client.reqHistoricalData(
                 reqId = req_id,
                 contract = contract,
@@ -289,8 +500,12 @@ class ChartHandler:
                 keepUpToDate = False, # Static snapshot; True = streaming update
                 chartOptions = []     # Leave empty unless using special features
             )
-            time.sleep(1)
-            self.chart.watermark(symbol)
+            # Wait for the data instead of a fixed delay. The chart update
+            # stops the spinner once it is displayed
+            if not historical_data_done.wait(timeout=5):
+                log('warning',"No historical data received for ReqId: %s", req_id)
+                self.client.historical_data_failed(req_id)
+            self.set_watermark(symbol)
 
         except Exception as e:
             log('warning',"Error retrieving historical data: %s", e)
@@ -351,16 +566,11 @@ class ChartHandler:
         order_action = "BUY" if key == 'B' else "SELL"
         order_quantity = 1
 
-        self.client.reqIds(-1)
-        time.sleep(2)
-        if self.client.order_id:
+        order_id = self.client.get_next_order_id(timeout=5)
+        if order_id is not None:
             log('info', "Order %s[ID: %d] for %d shares of %s",
-                        order_action, self.client.order_id, order_quantity, symbol)
-            order = Order()
-            order.orderType = "MKT"
-            order.totalQuantity = order_quantity
-            order.action = order_action
-
-            self.client.placeOrder(self.client.order_id, contract, order)
+                        order_action, order_id, order_quantity, symbol)
+            order = _make_market_order(order_action, order_quantity)
+            self.client.placeOrder(order_id, contract, order)
         else:
             log('error', "Order ID not received from IB API. Cannot place order.")
@@ -0,0 +1,178 @@
+"""Market data callbacks shared by IBClient and MockIBClient"""
+import datetime
+import logging
+from threading import Event
+from typing import Dict
+import numpy as np
+from ibapi.common import BarData
+from ibapi.wrapper import EWrapper
+
+from shared.bar_buffer import BarBuffer
+from shared.queue_manager import data_queue  # Importing shared queue
+from shared.logger import log, logger
+
+# Bound once, historicalData() checks the DEBUG level for every bar
+_is_enabled_for = logger.isEnabledFor
+
+###############################################################################
+class DataWrapper(EWrapper):
+    """EWrapper handling historical bars and real-time ticks.
+
+    The bars are buffered until the end of their request, then handed over to
+    the chart handler through the shared data queue. The ticks update the
+    chart directly.
+
+    Attributes:
+        chart_handler (ChartHandler): An instance of the chart handler.
+    """
+
+    ###########################################################################
+    def __init__(self):
+        """Initializes the market data state."""
+        EWrapper.__init__(self)
+        self.chart_handler = None  # Placeholder for ChartHandler instance
+        # Events set when a historical data request completes, by request ID
+        self.historical_data_events = {}
+        # (symbol, timeframe) of the pending historical data requests, by
+        # request ID, queued with their bars
+        self.historical_data_keys = {}
+        # Historical bars received until historicalDataEnd()
+        self.bar_buffer = BarBuffer()
+        # Bound once, historicalData() calls it for every bar
+        self._append_bar = self.bar_buffer.append
+
+    ###########################################################################
+    def set_chart_handler(self, chart_handler):
+        """
+        Assigns ChartHandler instance after creation.
+
+        Args:
+            chart_handler (ChartHandler): An instance of ChartHandler to manage charts."""
+        self.chart_handler = chart_handler
+
+    ###########################################################################
+    def expect_historical_data(self, req_id: int, data_key: tuple) -> Event:
+        """
+        Returns an event set when the historical data request `req_id`
+        completes, to be called before issuing the request.
+
+        Args:
+            req_id (int): The request ID.
+            data_key (tuple): The (symbol, timeframe) of the request, queued
+                        with its bars so the chart knows what they are.
+        """
+        event = Event()
+        self.historical_data_events[req_id] = event
+        self.historical_data_keys[req_id] = data_key
+        return event
+
+    ###########################################################################
+    def historical_data_failed(self, req_id: int):
+        """
+        Ends a historical data request that will not send its bars: stops
+        waiting for it, discards the bars it sent so far and hides the
+        spinner.
+
+        Args:
+            req_id (int): The request ID.
+        """
+        self.historical_data_keys.pop(req_id, None)
+        event = self.historical_data_events.pop(req_id, None)
+        if event is None:
+            return
+        # Partial bars must not be handed over with the next request ones
+        self.bar_buffer.clear()
+        event.set()
+        self.chart_handler.set_spinner(False)
+
+    ###########################################################################
+    def historicalData(self, reqId: int, bar: BarData):
+        """
+        Processes historical data received from IB.
+        This method is called for each bar of historical data.
+
+        Stores the bar in the bar buffer, the buffered bars are added to the
+        data queue all at once by `historicalDataEnd()`.
+
+        Args:
+            reqId (int): The request ID for historical data.
+            bar: A single bar of historical data.
+        """
+        self._append_bar(bar.date, bar.open, bar.high, bar.low,
+                         bar.close, bar.volume)
+        # Skip the log() call and its arguments for every bar when DEBUG is
+        # disabled
+        if _is_enabled_for(logging.DEBUG):
+            log('debug',"Received bar for request ID %d: t=%s o=%.4f h=%.4f l=%.4f c=%.4f v=%s",
+                reqId, bar.date, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+    ###########################################################################
+    def historicalDataBars(self, reqId: int, bars: Dict[str, np.ndarray]):
+        """
+        Processes a whole batch of historical bars at once, as
+        `historicalData()` does for each of them. Used by the mock client,
+        which loads its bars column by column.
+
+        Args:
+            reqId (int): The request ID for historical data.
+            bars (Dict[str, np.ndarray]): The time (epoch seconds), open,
+                        high, low, close and volume columns.
+        """
+        self.bar_buffer.extend(bars['time'], bars['open'], bars['high'],
+                               bars['low'], bars['close'], bars['volume'])
+        log('debug',"Received %d historical bars for request ID %d",
+            len(bars['time']), reqId)
+
+    ###########################################################################
+    def historicalDataEnd(self, reqId: int, start: str, end: str):
+        """
+        Handles the end of historical data retrieval.
+        This method is called when all requested historical data has been received.
+
+        Adds the received bars to the data queue, which schedules a chart
+        update to display them, unless no bars were received or the
+        request was given up meanwhile.
+
+        Args:
+            reqId (int): The request ID.
+            start (str): Start date of the retrieved data.
+            end (str): End date of the retrieved data.
+        """
+        log('info',"ReqId: %s, Start: %s, End: %s", reqId, start, end)
+        event = self.historical_data_events.pop(reqId, None)
+        if event:
+            event.set()
+        data_key = self.historical_data_keys.pop(reqId, None)
+        if data_key is None:
+            # The request failed or timed out, its bars would be displayed
+            # under the label of another request
+            log('warning',"Discarding late bars for ReqId: %s", reqId)
+            self.bar_buffer.clear()
+            return
+        if not len(self.bar_buffer):
+            # Nothing to display, the chart is not updated
+            log('info',"No bars received for ReqId: %s", reqId)
+            self.chart_handler.set_spinner(False)
+            return
+        # Add the bars to the shared queue, tagged with the request they
+        # answer, which wakes up the chart update
+        data_queue.append((data_key, self.bar_buffer.take()))
+
+    ###########################################################################
+    def tickPrice(self, reqId, tickType, price, attrib):
+        """Handles real-time price updates from IB.
+        This method is called for each price tick received.
+        Args:
+            reqId (int): The request ID for the market data.
+            tickType (int): Type of the tick (e.g., last price, bid, ask).
+            price (float): The price of the tick.
+            attrib: Additional attributes related to the tick.
+        """
+
+        # Filter only the tick types you care about (e.g., last price)
+        if tickType == 4:  # 4 = Last Price
+            tick = {
+                'time': datetime.datetime.now(datetime.timezone.utc),
+                'price': price
+            }
+            self.chart_handler.update_from_tick(tick)
@@ -1,18 +1,36 @@
 """IBClient Module"""
-import datetime
-import time
+import os
+from collections import OrderedDict
 # from threading import Thread, Event
-from threading import Thread
-import pandas as pd
+from threading import Condition, Event, Thread
 from ibapi.client import EClient
-from ibapi.wrapper import EWrapper
-from ibapi.common import BarData, TickerId, TagValueList
+from ibapi.common import TickerId, TagValueList
 from ibapi.contract import Contract
-from shared.queue_manager import data_queue  # Importing shared queue
+from ib_client.data_wrapper import DataWrapper
+from shared import config
 from shared.logger import log
+from shared.queue_manager import DequeQueue
+
+# Informational messages sent by IB through error(): market data and
+# historical data farm connection OK (2104, 2106, 2158), inactive (2107,
+# 2108) or connecting (2119), account data unsubscribed (2100) and cross
+# side order warning (2137)
+IB_STATUS_CODES = frozenset({2100, 2104, 2106, 2107, 2108, 2119, 2137, 2158})
+# Connection failures sent through error(): couldn't connect (502) and not
+# connected (504)
+IB_CONNECTION_ERROR_CODES = frozenset({502, 504})
+# Errors ending a historical data request: query returned an error or no
+# data (162), HMDS query message (165), expired contract (166), no security
+# definition (200), invalid request (321), request rejected (322) and no
+# historical data query found (366). Other errors with a request ID (e.g.
+# order warnings 399, 10167) refer to order IDs, which may collide with
+# request IDs
+IB_HISTORICAL_DATA_ERROR_CODES = frozenset({162, 165, 166, 200, 321, 322, 366})
+# Number of orders whose last status is remembered to skip the repeats
+MAX_ORDER_STATUSES = 1024
 
 ###############################################################################
-class IBClient(EWrapper, EClient):
+class IBClient(DataWrapper, EClient):
     """Interactive Brokers Client to manage connection and data retrieval.
 
     This class establishes a connection with Interactive Brokers, handles 
@@ -25,12 +43,21 @@ class IBClient(EWrapper, EClient):
     ###########################################################################
     def __init__(self):
         """Initializes IBClient"""
+        DataWrapper.__init__(self)
         EClient.__init__(self, self)
 
         self.current_req_id = 0
         self.connected = False
-        self.chart_handler = None  # Placeholder for ChartHandler instance
-        self.order_id = None  # Placeholder for order IDs
+        self.api_thread = None  # Thread running the IB API message loop
+        self.order_id = None  # Next order ID, None until received from IB
+        # Notified by nextValidId() when a new order ID has been received
+        self.order_id_cv = Condition()
+        # Set when a connection attempt completes, by nextValidId() when it
+        # succeeds or by error() when it fails
+        self.connection_event = Event()
+        # Last (status, filled) received for the most recently updated order
+        # IDs, the oldest ones are dropped beyond MAX_ORDER_STATUSES
+        self.order_statuses = OrderedDict()
         self.portfolio_manager = None
         # self.market_data_thread = None
         # self.stop_event = Event()
@@ -43,6 +70,18 @@ class IBClient(EWrapper, EClient):
     #         self.market_data_thread.join()
     #         self.stop_event.clear()
 
+    ###########################################################################
+    def reset(self):
+        """
+        Resets the client state, called by EClient at creation and on
+        disconnection.
+
+        Replaces the queue.Queue created by EClient between the socket reader
+        thread and run() with a DequeQueue, which takes no lock per message.
+        """
+        super().reset()
+        self.msg_queue = DequeQueue()
+
     ###########################################################################
     def reqMktData(self, reqId: TickerId, contract: Contract,
                     genericTickList: str, snapshot: bool,
@@ -81,14 +120,17 @@ class IBClient(EWrapper, EClient):
             client_id (int): Unique ID for the client session.
         """
         try:
+            self.connection_event.clear()
             super().connect(host, port, clientId)
 
-            # Start the socket in a thread
-            api_thread = Thread(target=self.run, daemon=False)
-            api_thread.start()
+            # Start the socket in a thread, stopped by close()
+            self.api_thread = Thread(target=self.run, daemon=True)
+            self.api_thread.start()
+            self.pin_api_thread(config.API_THREAD_CPU)
 
-            # Wait for connection
-            time.sleep(1)
+            # Wait for connection: IB sends the next valid order ID as soon
+            # as the session is established, a failure is reported at once
+            self.connection_event.wait(timeout=5)
 
             if self.isConnected():
                 log('info',"Connected to IB Gateway at %s:%d with client ID %d",
@@ -101,24 +143,63 @@ class IBClient(EWrapper, EClient):
             return False
 
         except Exception as e:
-            log('error', f"Connection error: {e}")
+            log('error', "Connection error: %s", e)
             return False
 
+    ###########################################################################
+    def pin_api_thread(self, cpu: int):
+        """
+        Pins the API thread to a CPU, so it keeps the socket buffers and its
+        Python frames in that CPU caches. Linux only.
+        Args:
+            cpu (int): The CPU number, negative to leave the thread unpinned.
+        """
+        if cpu < 0 or not hasattr(os, 'sched_setaffinity'):
+            return
+        try:
+            os.sched_setaffinity(self.api_thread.native_id, {cpu})
+            log('info', "IB API thread pinned to CPU %d", cpu)
+        except OSError as e:
+            log('warning', "Cannot pin the IB API thread to CPU %d: %s", cpu, e)
+
+    ###########################################################################
+    def close(self):
+        """Disconnects from IB and waits for the API thread to exit."""
+        self.disconnect()
+        if self.api_thread:
+            self.api_thread.join(timeout=2)
+            self.api_thread = None
+        self.connected = False
+
+    ###########################################################################
+    def get_next_order_id(self, timeout: float = 5):
+        """Returns the ID to use for a new order.
+
+        The next valid ID is requested from IB only when none is known yet,
+        it is then incremented locally for the following orders.
+
+        Args:
+            timeout (float): Seconds to wait for IB to send the ID.
+
+        Returns:
+            int | None: the order ID, None if it was not received in time.
+        """
+        with self.order_id_cv:
+            if self.order_id is None:
+                self.reqIds(-1)
+                if not self.order_id_cv.wait_for(
+                        lambda: self.order_id is not None, timeout):
+                    return None
+            order_id = self.order_id
+            self.order_id += 1
+            return order_id
+
     ###########################################################################
     def get_next_req_id(self):
         """Return the next calculated request id"""
         self.current_req_id += 1
         return self.current_req_id
 
-    ###########################################################################
-    def set_chart_handler(self, chart_handler):
-        """
-        Assigns ChartHandler instance after creation.
-        
-        Args:
-            chart_handler (ChartHandler): An instance of ChartHandler to manage charts."""
-        self.chart_handler = chart_handler
-
     ###########################################################################
     def error(self, reqId: int, errorTime: int, errorCode: int,
                errorString: str, advancedOrderRejectJson: str = ""):
@@ -132,36 +213,18 @@ class IBClient(EWrapper, EClient):
             errorString (str): Description of the error.
             misc (str, optional): Additional information. Defaults to "".
         """
-        if errorCode in [2104, 2106, 2158]:  # Common IB status messages
+        if errorCode in IB_STATUS_CODES:  # Common IB status messages
             log('warning',"IB Status Message: %s", errorString)
-        else:
-            log('error',"IB Error %d: %s (Request ID: %d, Time: %s)",
-                         errorCode, errorString, reqId, errorTime)
+            return
 
-    ###########################################################################
-    def historicalData(self, reqId: int, bar: BarData):
-        """
-        Processes historical data received from IB. 
-        This method is called for each bar of historical data.
-
-        Converts IB bar data into a dictionary and adds it to the data queue.
-
-        Args:
-            req_id (int): The request ID for historical data.
-            bar: A single bar of historical data.
-        """
-        t = datetime.datetime.fromtimestamp(int(bar.date))
-        data = {
-            'date': t,
-            'open': bar.open,
-            'high': bar.high,
-            'low': bar.low,
-            'close': bar.close,
-            'volume': int(bar.volume)
-        }
-        # Add the data to the shared queue for processing)
-        data_queue.put(data)
-        log('debug',"Received historical data for request ID %d: %s", reqId, data)
+        log('error',"IB Error %d: %s (Request ID: %d, Time: %s)",
+                     errorCode, errorString, reqId, errorTime)
+        if errorCode in IB_CONNECTION_ERROR_CODES:
+            self.connection_event.set()
+        # Do not keep waiting for a historical data request that failed
+        if (errorCode in IB_HISTORICAL_DATA_ERROR_CODES
+                and reqId in self.historical_data_events):
+            self.historical_data_failed(reqId)
 
     ############################################################################
     def cancelMktData(self, req_id):
@@ -176,51 +239,16 @@ class IBClient(EWrapper, EClient):
         log('info',"Tick cancel market data for ReqId: %s", req_id)
         # This is where you would handle the cancellation logic if needed.
         # For now, we just log it.
-        self.chart_handler.chart.spinner(False)
-
-    ###########################################################################
-    def historicalDataEnd(self, reqId: int, start: str, end: str):
-        """
-        Handles the end of historical data retrieval.
-        This method is called when all requested historical data has been received.
-
-        Calls `update_chart()` to display the retrieved data.
-
-        Args:
-            reqId (int): The request ID.
-            start (str): Start date of the retrieved data.
-            end (str): End date of the retrieved data.
-        """
-        self.chart_handler.chart.spinner(False)
-        log('debug',"Updating chart with new data after historical data retrieval.")
-        # Update the chart with the new data
-        self.chart_handler.update_chart()
-
-    ###########################################################################
-    def tickPrice(self, reqId, tickType, price, attrib):
-        """Handles real-time price updates from IB.
-        This method is called for each price tick received.
-        Args:
-            reqId (int): The request ID for the market data.
-            tickType (int): Type of the tick (e.g., last price, bid, ask).
-            price (float): The price of the tick.
-            attrib: Additional attributes related to the tick.
-        """
-
-        # Filter only the tick types you care about (e.g., last price)
-        if tickType == 4:  # 4 = Last Price
-            tick = pd.Series({
-                'time': datetime.datetime.now(datetime.timezone.utc),
-                'price': price
-            })
-            data_queue.put(tick)
-            self.chart_handler.chart.update_from_tick(tick)
+        self.chart_handler.set_spinner(False)
 
     ###########################################################################
     def nextValidId(self, orderId: int):
         """Receives the next valid order ID from IB API."""
         super().nextValidId(orderId)
-        self.order_id = orderId
+        with self.order_id_cv:
+            self.order_id = orderId
+            self.order_id_cv.notify_all()
+        self.connection_event.set()
         log('debug',"Next valid order ID: %d", self.order_id)
 
     ###########################################################################
@@ -240,6 +268,15 @@ class IBClient(EWrapper, EClient):
             clientId (int): Client ID associated with the order.
             whyHeld (str): Reason why the order is held, if applicable.
         """
+        # IB sends the same status several times, only handle the changes
+        order_status = (status, filled)
+        if self.order_statuses.get(orderId) == order_status:
+            return
+        # Terminal statuses are kept too, IB repeats 'Filled' several times
+        self.order_statuses[orderId] = order_status
+        self.order_statuses.move_to_end(orderId)
+        if len(self.order_statuses) > MAX_ORDER_STATUSES:
+            self.order_statuses.popitem(last=False)
         super().orderStatus(orderId, status, filled, remaining, avgFillPrice,
                             permId, parentId, lastFillPrice, clientId, whyHeld,
                             mktCapPrice)
@@ -1,50 +1,48 @@
 """Module to mock EClient and EWrapper"""
 import os
-import datetime
 import csv
-import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from ibapi.client import EClient
-from ibapi.common import BarData, TickerId, TagValueList
+from ibapi.common import TickerId, TagValueList
 from ibapi.contract import Contract
 from ibapi.wrapper import EWrapper
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 
 
 # Import default configuration
-from shared.queue_manager import data_queue  # Importing shared queue
+from ib_client.data_wrapper import DataWrapper
 from shared.logger import log
 
+# Seconds between two simulated real-time ticks
+MOCK_TICK_INTERVAL = 0.1
+# Columns of the historical data CSV files and their dtype
+MOCK_BAR_DTYPES = {
+    'time': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+}
+# Directory of the CSV files the mock client reads its data from
+MOCK_DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                              "..", "DataFiles"))
+# Maximum number of historical data CSV files read at the same time
+MOCK_HISTORICAL_WORKERS = 4
+# Workers reading the historical data CSV files, so that reqHistoricalData()
+# returns without waiting for the read, as the real IB API does
+_historical_data_pool = ThreadPoolExecutor(max_workers=MOCK_HISTORICAL_WORKERS,
+                                           thread_name_prefix='mock-historical')
+
 ###########################################################################
-class MockEWrapper(EWrapper):
+class MockEWrapper(DataWrapper):
     """
-    EWrappper Mock Class
+    EWrappper Mock Class, the market data callbacks are the ones of
+    DataWrapper
     """
 
-    ###########################################################################
-    def __init__(self):
-        """Initialize the MockEWrapper."""
-
-        self.chart_handler = None
-
-    ###########################################################################
-    def historicalData(self, reqId: int, bar: BarData):
-        """Handle historical data received from the mock client."""
-
-        # Convert the date from string to datetime object
-        t = datetime.datetime.fromtimestamp(int(bar.date))
-        data = {
-            'date': t,
-            'open': bar.open,
-            'high': bar.high,
-            'low': bar.low,
-            'close': bar.close,
-            'volume': int(bar.volume)
-        }
-        # Add the data to the shared queue for processing)
-        data_queue.put(data)
-        log('debug',"Received historical data for request ID %d: %s", reqId, data)
-
     ############################################################################
     def cancelMktData(self, req_id):
         
@@ -53,36 +51,7 @@ class MockEWrapper(EWrapper):
         log('info',"[Mock Wrapper] Tick cancel market data for ReqId: %s", req_id)
         # This is where you would handle the cancellation logic if needed.
         # For now, we just log it.
-        self.chart_handler.chart.spinner(False)
-
-    ###########################################################################
-    def historicalDataEnd(self, reqId: int, start: str, end: str):
-        """Handle the end of historical data stream."""
-
-        log('info',"[Mock Wrapper] - ReqId: %s, Start: %s, End: %s", reqId, start, end)
-        # Update the chart with the new data
-        self.chart_handler.update_chart()
-        self.chart_handler.chart.spinner(False)
-
-    ###########################################################################
-    def tickPrice(self, reqId, tickType, price, attrib):
-        """Handle tick price updates from the mock client."""
-
-        # Filter only the tick types you care about (e.g., last price)
-        if tickType == 4:  # 4 = Last Price
-            tick = pd.Series({
-                'time': datetime.datetime.now(datetime.timezone.utc),
-                'price': price
-            })
-            data_queue.put(tick)
-            self.chart_handler.chart.update_from_tick(tick)
-
-    ###########################################################################
-    def set_chart_handler(self, chart_handler):
-        """
-        Assigns ChartHandler instance after creation.
-        """
-        self.chart_handler = chart_handler
+        self.chart_handler.set_spinner(False)
 
 ###########################################################################
 class MockEClient(EClient):
@@ -93,6 +62,12 @@ class MockEClient(EClient):
         super().__init__(wrapper)
         self.current_req_id = 0
         self.mock_data_path = None
+        # Paths of the CSV data files by file name, listed once instead of
+        # checking for the file on every request
+        self.mock_data_files = self.index_mock_data_files()
+        # The CSV files are read in parallel, but the bars of a request are
+        # handed over to the wrapper at once, as the IB API thread would
+        self._historical_data_lock = Lock()
 
     ###########################################################################
     def connect(self, host: str, port: int, clientId: int) -> bool:
@@ -115,6 +90,18 @@ class MockEClient(EClient):
         self.current_req_id += 1
         return self.current_req_id
 
+    ###########################################################################
+    @staticmethod
+    def index_mock_data_files() -> dict:
+        """Returns the paths of the CSV files of MOCK_DATA_DIR by file name."""
+        try:
+            with os.scandir(MOCK_DATA_DIR) as entries:
+                return {entry.name: entry.path for entry in entries
+                        if entry.name.endswith('.csv') and entry.is_file()}
+        except OSError as e:
+            log('error',"[ERROR] Cannot list the data files in %s: %s", MOCK_DATA_DIR, e)
+            return {}
+
     ###########################################################################
     def reqHistoricalData(self, reqId, contract, endDateTime, durationStr,
                           barSizeSetting, whatToShow, useRTH, formatDate,
@@ -125,13 +112,17 @@ class MockEClient(EClient):
         log('info',"[Mock Client] Simulating reqHistoricalData for ReqId: %s", reqId)
 
         data_file = f"{contract.symbol}_{barSizeSetting.replace(' ','_')}.csv"
-        self.mock_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                           "../DataFiles", data_file)
-        log('info',"Using data file: %s", self.mock_data_path)
-        if not os.path.exists(self.mock_data_path):
-            log('error',"[ERROR] Data file does not exist: %s", self.mock_data_path)
+        if data_file not in self.mock_data_files:
+            log('error',"[ERROR] Data file does not exist: %s",
+                os.path.join(MOCK_DATA_DIR, data_file))
+            self.wrapper.historical_data_failed(reqId)
             return
-        self.simulate_historical_data_from_csv(reqId, self.mock_data_path)
+        self.mock_data_path = self.mock_data_files[data_file]
+        log('info',"Using data file: %s", self.mock_data_path)
+        # Read the file on a worker, pd.read_csv() releases the GIL while
+        # parsing
+        _historical_data_pool.submit(self.simulate_historical_data_from_csv,
+                                     reqId, self.mock_data_path)
 
     ###########################################################################
     def simulate_historical_data_from_csv(self, req_id: int, filepath: str):
@@ -139,31 +130,25 @@ class MockEClient(EClient):
         """Simulate HistoricalData retrieval."""
 
         try:
-            bars = []
             log('info',"[Mock Client] Reading %s", filepath)
-            with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    bar = BarData()
-                    bar.date = row['time']
-                    bar.open = float(row['open'])
-                    bar.high = float(row['high'])
-                    bar.low = float(row['low'])
-                    bar.close = float(row['close'])
-                    bar.volume = float(row['volume'])
-                    bar.barCount = 1
-                    bar.average = (bar.open + bar.close) / 2
-                    bar.hasGaps = False
-                    self.wrapper.historicalData(req_id, bar)
-                    bars.append(bar)
-                if bars:
-                    self.wrapper.historicalDataEnd(req_id, bars[0].date,
-                                                   bars[-1].date)
+            # Load all the bars at once, column by column
+            df = pd.read_csv(filepath, usecols=list(MOCK_BAR_DTYPES),
+                             dtype=MOCK_BAR_DTYPES)
+            if not df.empty:
+                with self._historical_data_lock:
+                    self.wrapper.historicalDataBars(
+                        req_id, {name: df[name].to_numpy() for name in MOCK_BAR_DTYPES})
+                    self.wrapper.historicalDataEnd(req_id, str(df['time'].iloc[0]),
+                                                   str(df['time'].iloc[-1]))
+                return
+            log('info',"[Mock Client] No bars in %s", filepath)
 
         except FileNotFoundError:
             log('error',"[ERROR] File not found: %s", filepath)
         except Exception as e:
             log('error',"[ERROR] Failed to read mock data: %s", e)
+        # No bars were sent, end the request
+        self.wrapper.historical_data_failed(req_id)
 
 ###########################################################################
 class MockIBClient(MockEWrapper, MockEClient):
@@ -201,24 +186,28 @@ class MockIBClient(MockEWrapper, MockEClient):
         Simulate Market Data retrieval from a CSV file."""
 
         try:
-            ticks = []
+            ticked = False
             log('info',"[Mock Client] Reading %s", filepath)
             with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
+                # Read the rows as lists, the close column index is resolved
+                # once from the header instead of building a dict per row
+                reader = csv.reader(csvfile)
+                close_index = next(reader).index('close')
                 for row in reader:
-                    if self.stop_event.is_set(): 
+                    # Simulate a delay between ticks, the wait ends as soon
+                    # as stop_market_data() is called
+                    if self.stop_event.wait(MOCK_TICK_INTERVAL):
                         log('info',"[Mock Client] Market data simulation stopped.")
                         break
 
                     self.wrapper.tickPrice(req_id,
                                     tickType = 4, # last price
-                                    price = float(row['close']),
+                                    price = float(row[close_index]),
                                     attrib = None)
-                    ticks.append(row)
-                    time.sleep(0.1)  # Simulate a delay between ticks
+                    ticked = True
             # If there are ticks and the stop event is not set, cancel market
             #  data subscription
-            if ticks and not self.stop_event.is_set():
+            if ticked and not self.stop_event.is_set():
                 self.wrapper.cancelMktData(req_id)
 
         except FileNotFoundError:
@@ -237,12 +226,12 @@ class MockIBClient(MockEWrapper, MockEClient):
 
         log('info',"[Mock Client] Simulating reqMktData for ReqId: %s", reqId)
         data_file = f"{contract.symbol}_ticks.csv"
-        self.mock_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                           "../DataFiles", data_file)
-        log('info',"Using data file: %s", self.mock_data_path)
-        if not os.path.exists(self.mock_data_path):
-            log('error',"[ERROR] Market data file does not exist: %s", self.mock_data_path)
+        if data_file not in self.mock_data_files:
+            log('error',"[ERROR] Market data file does not exist: %s",
+                os.path.join(MOCK_DATA_DIR, data_file))
             return
+        self.mock_data_path = self.mock_data_files[data_file]
+        log('info',"Using data file: %s", self.mock_data_path)
 
         # Simulate market data retrieval
         self.stop_market_data()
@@ -1,11 +1,8 @@
 """ Main application code"""
-import time
 import sys
 from shared import config
 from shared.logger import logger
 from chart_handler.chart import ChartHandler
-from ib_client.ib_client import IBClient
-from ib_client.ib_client_mock import MockIBClient
 
 ###############################################################################
 # Main entry point for the IB Client application
@@ -17,17 +14,19 @@ if __name__ == "__main__":
     chart_handler = ChartHandler()
     client = None
     # Choose real or mock client
+    # Only the selected client module is imported
     if config.MOCK_MODE:
         logger.info("Running in MOCK mode.")
+        from ib_client.ib_client_mock import MockIBClient
         client = MockIBClient()
     else:
+        from ib_client.ib_client import IBClient
         client = IBClient()
         if not client.connect(config.DEFAULT_HOST, config.TRADING_PORT, config.DEFAULT_CLIENT_ID):
             sys.exit()
 
     client.set_chart_handler(chart_handler)
     chart_handler.set_client(client)
-    time.sleep(1)
 
     # Request initial data
     chart_handler.request_historical_data(config.INITIAL_SYMBOL,
@@ -35,3 +34,7 @@ if __name__ == "__main__":
     chart_handler.show_chart()
     #chart_handler.chart.show()
     chart_handler.request_realtime_data(config.INITIAL_SYMBOL)
+
+    # Disconnect from IB once the chart is closed
+    if not config.MOCK_MODE:
+        client.close()
@@ -1,7 +1,18 @@
 # position_manager.py
 from typing import Dict
 from ibapi.contract import Contract
-from logger import logger
+from shared.logger import logger
+
+###############################################################################
+class _Position:
+    """Position held in a contract, updated in place."""
+    __slots__ = ("contract", "quantity", "avg_cost")
+
+    ###########################################################################
+    def __init__(self, contract: Contract, quantity: int, avg_cost: float):
+        self.contract = contract
+        self.quantity = quantity
+        self.avg_cost = avg_cost
 
 ###############################################################################
 # PortfolioManager class to manage trading positions.
@@ -13,31 +24,58 @@ class PortfolioManager:
     def __init__(self):
         """
         Initializes the PortfolioManager with an empty positions dictionary.
-        This dictionary will hold positions keyed by contract symbol, with each
-        position containing details such as contract, quantity, and average cost.
+        This dictionary will hold positions keyed by contract symbol, with
+        each position containing details such as contract, quantity, and
+        average cost.
         """
         logger.info("Initializing PortfolioManager...")
         self.client = None  # Placeholder for IBClient instance
+        # Positions by contract symbol
+        self.positions: Dict[str, _Position] = {}
 
     ###########################################################################
-    def update_position(self, contract: Contract, quantity_change: int):
+    def update_position(self, contract: Contract, position: int,
+                        avg_cost: float):
         """
-        Updates the position for a given contract.
+        Sets the position held in a given contract, as reported by IB.
+
+        The position of a symbol is created on its first update, then
+        updated in place, and removed once it is closed.
+
+        Args:
+            contract (Contract): The contract.
+            position (int): The quantity held, negative when short.
+            avg_cost (float): The average cost of the position.
         """
-        logger.info(f"Updating position for {contract.symbol} with quantity change: {quantity_change}")
-        
+        logger.info("Updating position for %s: %s at %s",
+                    contract.symbol, position, avg_cost)
+        if position == 0:
+            # The position is closed
+            self.positions.pop(contract.symbol, None)
+            return
+        p = self.positions.get(contract.symbol)
+        if p is None:
+            self.positions[contract.symbol] = _Position(contract, position,
+                                                        avg_cost)
+        else:
+            p.quantity = position
+            p.avg_cost = avg_cost
+            p.contract = contract
+
     ###########################################################################
     def has_position(self, symbol: str) -> bool:
-        logger.info(f"Checking position for {symbol}")
-        return True
+        """Returns True if an open position is held in `symbol`."""
+        return symbol in self.positions
 
     ###########################################################################
-    def get_position(self, symbol: str):
-        logger.info(f"Retrieving position for {symbol}")
+    def get_position(self, symbol: str) -> _Position | None:
+        """Returns the position held in `symbol`, None if there is none."""
+        return self.positions.get(symbol)
 
     ###########################################################################
     def clear(self):
         logger.info("Clearing all positions...")
+        self.positions.clear()
 
     ###########################################################################
     def set_client(self, client):
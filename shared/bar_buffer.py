@@ -0,0 +1,123 @@
+"""Historical bars buffer"""
+from typing import Dict
+from dateutil.tz import tzlocal
+import numpy as np
+import pandas as pd
+
+# Initial number of bars the buffer can hold, doubled when full
+INITIAL_CAPACITY = 1024
+# Local time zone the bar dates are converted to
+LOCAL_TZ = tzlocal()
+
+
+###############################################################################
+class BarBuffer:
+    """Historical bars stored column by column (struct of arrays).
+
+    Bars are written into preallocated numpy arrays as they are received
+    and handed over all at once with `take()`. Both are called from the IB
+    API thread only, so no locking is needed.
+    """
+
+    ###########################################################################
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """Allocates the column arrays for `capacity` bars."""
+        # Dates are stored as received, epoch seconds as a string (or int),
+        # and parsed to int64 once in take()
+        self._date = np.empty(capacity, dtype=object)
+        self._open = np.empty(capacity, dtype=np.float64)
+        self._high = np.empty(capacity, dtype=np.float64)
+        self._low = np.empty(capacity, dtype=np.float64)
+        self._close = np.empty(capacity, dtype=np.float64)
+        # Volumes are received as Decimal (float with the mock client) and
+        # stored as float64, they are truncated to int64 once in take()
+        self._volume = np.empty(capacity, dtype=np.float64)
+        self._count = 0
+
+    ###########################################################################
+    def __len__(self) -> int:
+        """Returns the number of buffered bars."""
+        return self._count
+
+    ###########################################################################
+    def append(self, date, open_: float, high: float, low: float,
+               close: float, volume):
+        """Appends a bar, growing the arrays when they are full.
+
+        Args:
+            date (str | int): The bar date as epoch seconds.
+            open_, high, low, close (float): The bar prices.
+            volume (Decimal | float): The bar volume, as received.
+        """
+        n = self._count
+        if n == len(self._date):
+            self._grow(max(2 * n, 1))
+        self._date[n] = date
+        self._open[n] = open_
+        self._high[n] = high
+        self._low[n] = low
+        self._close[n] = close
+        self._volume[n] = volume
+        self._count = n + 1
+
+    ###########################################################################
+    def extend(self, date: np.ndarray, open_: np.ndarray, high: np.ndarray,
+               low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        """Appends several bars given column by column.
+
+        Args:
+            date (np.ndarray): The bar dates as epoch seconds.
+            open_, high, low, close (np.ndarray): The bar prices.
+            volume (np.ndarray): The bar volumes.
+        """
+        start = self._count
+        end = start + len(date)
+        capacity = len(self._date)
+        if end > capacity:
+            capacity = max(capacity, 1)
+            while capacity < end:
+                capacity *= 2
+            self._grow(capacity)
+        self._date[start:end] = date
+        self._open[start:end] = open_
+        self._high[start:end] = high
+        self._low[start:end] = low
+        self._close[start:end] = close
+        self._volume[start:end] = volume
+        self._count = end
+
+    ###########################################################################
+    def clear(self):
+        """Discards the buffered bars, keeping the allocated arrays."""
+        self._count = 0
+
+    ###########################################################################
+    def _grow(self, capacity: int):
+        """Resizes every column array to `capacity` bars."""
+        self._date = np.resize(self._date, capacity)
+        self._open = np.resize(self._open, capacity)
+        self._high = np.resize(self._high, capacity)
+        self._low = np.resize(self._low, capacity)
+        self._close = np.resize(self._close, capacity)
+        self._volume = np.resize(self._volume, capacity)
+
+    ###########################################################################
+    def take(self) -> Dict[str, np.ndarray]:
+        """Returns the buffered bars as a dict of column arrays and empties
+        the buffer.
+
+        The dates are converted once for all the bars to local datetimes,
+        as datetime.fromtimestamp() would.
+        """
+        n = self._count
+        self._count = 0
+        dates = pd.to_datetime(self._date[:n].astype(np.int64), unit='s',
+                               utc=True)
+        return {
+            'date': dates.tz_convert(LOCAL_TZ).tz_localize(None).to_numpy(),
+            'open': self._open[:n].copy(),
+            'high': self._high[:n].copy(),
+            'low': self._low[:n].copy(),
+            'close': self._close[:n].copy(),
+            'volume': self._volume[:n].astype(np.int64),
+        }
@@ -25,4 +25,6 @@ SMA_SHORT_PERIOD = cfg.getint('DEFAULT', 'SMA_SHORT_PERIOD', fallback=20)
 SMA_LONG_PERIOD = cfg.getint('DEFAULT', 'SMA_LONG_PERIOD', fallback=50)
 SMA_SHORT_COLOR = cfg.get('DEFAULT', 'SMA_SHORT_COLOR', fallback='blue')
 SMA_LONG_COLOR = cfg.get('DEFAULT', 'SMA_LONG_COLOR', fallback='red')
+# CPU the IB API reader thread is pinned to, -1 to let the OS schedule it
+API_THREAD_CPU = cfg.getint('DEFAULT', 'API_THREAD_CPU', fallback=-1)
 SCAN_CODE = cfg.get('DEFAULT', 'SCAN_CODE', fallback='Top Percent Gainers')
@@ -1,11 +1,18 @@
 # logger.py
-import os, inspect
+import os
+import sys
+import atexit
 import logging
-import inspect
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Values accepted for the LOG_LEVEL environment variable
+VALID_LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-if LOG_LEVEL not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
-    raise ValueError(f"Invalid log level: {LOG_LEVEL}")
+if LOG_LEVEL not in VALID_LOG_LEVELS:
+    raise ValueError(f"Invalid log level: {LOG_LEVEL}, "
+                     f"expected one of {', '.join(VALID_LOG_LEVELS)}")
 
 # Log to console or file based on environment variable
 LOG_FILE = os.getenv("LOG_FILE", "")
@@ -24,9 +31,17 @@ if LOG_FILE and not os.path.isabs(LOG_FILE):
 handler = logging.StreamHandler() if LOG_FILE == "" else logging.FileHandler(LOG_FILE)
 handler.setFormatter(formatter)
 
+# The logging threads (e.g. the IB API thread) only put the records in a
+# queue, a listener thread formats them and writes them with the handler
+log_queue = queue.SimpleQueue()
+listener = QueueListener(log_queue, handler)
+listener.start()
+# Flush the queued records at exit
+atexit.register(listener.stop)
+
 logger = logging.getLogger("ib_app")
 logger.setLevel(LOG_LEVEL)
-logger.addHandler(handler)
+logger.addHandler(QueueHandler(log_queue))
 logger.propagate = False  # Prevents double logging if root logger is used
 
 # Suppress ibapi logging
@@ -36,20 +51,26 @@ logger.propagate = False  # Prevents double logging if root logger is used
 logging.getLogger("ibapi").setLevel(logging.WARNING)
 
 
+# log() levels by name, unknown names are logged as INFO
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
 def log(level, message, *args):
-    method_name = inspect.stack()[1][3]
-    full_message = f"[{method_name}] {message}"
-    
-    if level == 'debug':
-        logger.debug(full_message, *args)
-    elif level == 'info':
-        logger.info(full_message, *args)
-    elif level == 'warning':
-        logger.warning(full_message, *args)
-    elif level == 'error':
-        logger.error(full_message, *args)
-    elif level == 'critical':
-        logger.critical(full_message, *args)
+    level_no = LOG_LEVELS.get(level)
+    # Skip the caller lookup and the formatting when the record is dropped
+    if not logger.isEnabledFor(level_no or logging.INFO):
+        return
+    # Name of the calling function, read from its frame
+    method_name = sys._getframe(1).f_code.co_name
+    # stacklevel=2 reports the caller of log() in the DEBUG format
+    if level_no is None:
+        logger.info("[%s] Unknown log level '%s': " + message,
+                    method_name, level, *args, stacklevel=2)
     else:
-        logger.info(f"[{method_name}] Unknown log level '{level}': {message}", *args)
-
+        logger.log(level_no, "[%s] " + message, method_name, *args,
+                   stacklevel=2)
@@ -1,4 +1,111 @@
+import collections
 import queue
+import threading
+
+
+###############################################################################
+class NotifiableDeque:
+    """Single producer, single consumer queue.
+
+    Items are appended by the IB API thread and drained by the chart worker
+    thread. Appending sets an event the consumer waits on, instead of the
+    lock and condition taken by queue.Queue on every put: deque appends and
+    pops are already thread safe.
+    """
+
+    ###########################################################################
+    def __init__(self):
+        self._items = collections.deque()
+        self._ready = threading.Event()
+
+    ###########################################################################
+    def __len__(self) -> int:
+        return len(self._items)
+
+    ###########################################################################
+    def append(self, item):
+        """Adds an item and wakes up the consumer."""
+        self._items.append(item)
+        self._ready.set()
+
+    put = append
+
+    ###########################################################################
+    def popleft(self):
+        """Removes and returns the oldest item, raises IndexError if empty."""
+        return self._items.popleft()
+
+    get = popleft
+
+    ###########################################################################
+    def drain(self) -> list:
+        """Removes and returns the items queued so far, the ones appended
+        meanwhile are left for the next drain."""
+        items = self._items
+        return [items.popleft() for _ in range(len(items))]
+
+    ###########################################################################
+    def clear(self):
+        """Discards the queued items."""
+        self._items.clear()
+
+    ###########################################################################
+    def notify(self):
+        """Wakes up the consumer without adding an item."""
+        self._ready.set()
+
+    ###########################################################################
+    def wait(self, timeout: float = None) -> bool:
+        """Waits until items are appended or notify() is called.
+
+        The notification is consumed, so the items must be drained after
+        this returns: the ones appended later notify the consumer again.
+
+        Returns:
+            bool: False if the timeout expired.
+        """
+        if not self._ready.wait(timeout):
+            return False
+        self._ready.clear()
+        return True
+
+
+###############################################################################
+class DequeQueue(NotifiableDeque):
+    """Drop-in replacement of the queue.Queue between the ibapi EReader
+    thread and the EClient.run() loop.
+
+    ibapi has one reader thread putting messages and one thread getting
+    them, so a NotifiableDeque is enough. Only the methods called by ibapi
+    are provided.
+    """
+
+    ###########################################################################
+    def get(self, block: bool = True, timeout: float = None):
+        """Removes and returns the oldest item, as queue.Queue.get() does.
+
+        Raises:
+            queue.Empty: if no item is available within the timeout.
+        """
+        items = self._items
+        while True:
+            if items:
+                return items.popleft()
+            if not block:
+                raise queue.Empty
+            # Clear before checking again, so an item appended meanwhile is
+            # not missed
+            self._ready.clear()
+            if items:
+                return items.popleft()
+            if not self._ready.wait(timeout):
+                raise queue.Empty
+
+    ###########################################################################
+    def empty(self) -> bool:
+        """Returns True if no item is queued."""
+        return not self._items
+
 
 # Create a global queue for shared data exchange
-data_queue = queue.Queue()
\ No newline at end of file
+data_queue = NotifiableDeque()
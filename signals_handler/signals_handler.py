@@ -1,10 +1,17 @@
+import logging
+import math
 import pandas as pd
-from typing import Dict, List 
-from shared.logger import log
+from shared.logger import log, logger
 from shared import config
 
+# SMA column names, built once from the configured periods
+SMA_SHORT_COLUMN = f'SMA_{config.SMA_SHORT_PERIOD}'
+SMA_LONG_COLUMN = f'SMA_{config.SMA_LONG_PERIOD}'
+# Columns sma_crossover_signal() needs
+SMA_REQUIRED_COLUMNS = (SMA_SHORT_COLUMN, SMA_LONG_COLUMN)
+
 ###############################################################################
-def sma_crossover_signal(bars: List[Dict]) -> str | None:
+def sma_crossover_signal(bars: pd.DataFrame) -> str | None:
     """
     Function to generate a trading signal based on Simple Moving Average (SMA) crossover
     This function checks the last two values of the short and long SMAs to determine
@@ -12,49 +19,50 @@ def sma_crossover_signal(bars: List[Dict]) -> str | None:
     It returns "BUY" if the short SMA crosses above the long SMA, "SELL" if it crosses below,
     or None if no crossover is detected.
     Args:
-        bars: List[Dict]: List of current received historical data with SMA columns.
+        bars: pd.DataFrame: The current received historical data with SMA columns.
     Returns:
         str | None: Returns "BUY" if a buy signal is detected, "SELL" if a sell signal is detected,
                     or None if no signal is detected.   
     """
 
-    log('debug', "generating SMA crossover signals")
-    df = pd.DataFrame(bars)
-    required_columns = [f'SMA_{config.SMA_SHORT_PERIOD}', f'SMA_{config.SMA_LONG_PERIOD}']
+    # Check the level once, the signal is computed on every chart update
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        log('debug', "generating SMA crossover signals")
     # Check column existence
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    # Check for all-NaN or None values
-    empty_columns = [col for col in required_columns
-                    if col in df.columns and df[col].dropna().empty]
-    if missing_columns or empty_columns:
-        if missing_columns:
-            log('debug', f"Missing columns: {missing_columns}")
-            return None
-        if empty_columns:
-            log('debug', f"Columns with only NaN/None: {empty_columns}")
-            return None
+    missing_columns = [col for col in SMA_REQUIRED_COLUMNS if col not in bars]
+    if missing_columns:
+        if debug:
+            log('debug', "Missing columns: %s", missing_columns)
+        return None
 
-    # This ensures that only rows where both SMA columns have valid values are kept.
-    sma_df = df[['date',
-                 f'SMA_{config.SMA_SHORT_PERIOD}',
-                 f'SMA_{config.SMA_LONG_PERIOD}']].dropna(
-                     subset=[f'SMA_{config.SMA_SHORT_PERIOD}',
-                             f'SMA_{config.SMA_LONG_PERIOD}'])
+    # Only the last two rows where both SMAs have valid values are needed.
+    # Walk back from the last bar: the SMAs are only NaN before their first
+    # full period, so this usually stops after two rows
+    sma_short = bars[SMA_SHORT_COLUMN].to_numpy()
+    sma_long = bars[SMA_LONG_COLUMN].to_numpy()
+    rows = []
+    for i in range(len(sma_short) - 1, -1, -1):
+        if not (math.isnan(sma_short[i]) or math.isnan(sma_long[i])):
+            rows.append(i)
+            if len(rows) == 2:
+                break
 
-    if len(sma_df) < 2: return # Not enough data
+    if len(rows) < 2: return # Not enough data
 
-    p_sma_short = sma_df.iloc[-2][f'SMA_{config.SMA_SHORT_PERIOD}']
-    c_sma_short = sma_df.iloc[-1][f'SMA_{config.SMA_SHORT_PERIOD}']
-    p_sma_long = sma_df.iloc[-2][f'SMA_{config.SMA_LONG_PERIOD}']
-    c_sma_long = sma_df.iloc[-1][f'SMA_{config.SMA_LONG_PERIOD}']
+    current, previous = rows
+    p_sma_short = sma_short[previous]
+    c_sma_short = sma_short[current]
+    p_sma_long = sma_long[previous]
+    c_sma_long = sma_long[current]
 
-    log('debug', "%f %f %f %f", p_sma_short, c_sma_short, p_sma_long, c_sma_long)
+    if debug:
+        log('debug', "%f %f %f %f", p_sma_short, c_sma_short, p_sma_long, c_sma_long)
 
-    if pd.notna(p_sma_short) and pd.notna(c_sma_short) and pd.notna(p_sma_long) and pd.notna(c_sma_long):
-        if c_sma_short > c_sma_long and p_sma_short <= p_sma_long:
-            return "buy"
-        elif c_sma_short < c_sma_long and p_sma_short >= p_sma_long:
-            return "sell"
+    if c_sma_short > c_sma_long and p_sma_short <= p_sma_long:
+        return "buy"
+    elif c_sma_short < c_sma_long and p_sma_short >= p_sma_long:
+        return "sell"
     return None
 
 ###############################################################################
@@ -62,8 +70,8 @@ def volumes_signal(df: pd.DataFrame) -> str | None:
     return None
 
 ###############################################################################
-#signals_functions = [sma_crossover_signal, volumes_signal]
-signals_functions = [sma_crossover_signal]
+#signals_functions = (sma_crossover_signal, volumes_signal)
+signals_functions = (sma_crossover_signal,)
 
 ###############################################################################
 def buy_or_sell_based_on_signals(df: pd.DataFrame) -> str | None:
@@ -79,20 +87,18 @@ def buy_or_sell_based_on_signals(df: pd.DataFrame) -> str | None:
     Returns:
         Returns, base of the magiority the BUY or SELL signal
     """
-    signals = [func(df) for func in signals_functions]
-    # For now return the only signal we have
-    return signals[len(signals_functions)-1]
-    # # Filter out None valuea
-    # filtered = [s for s in signals if s is not None]
-
-    # # Count each signal
-    # buy_count = filtered.count("Buy")
-    # sell_count = filtered.count("Sell")
+    # Count the signals as they are produced, None results are skipped
+    buy_count = sell_count = 0
+    for func in signals_functions:
+        signal = func(df)
+        if signal == "buy":
+            buy_count += 1
+        elif signal == "sell":
+            sell_count += 1
 
-    # # Decide Buy or Sel base on the majority
-    # if buy_count > sell_count:
-    #     return "Buy"
-    # elif sell_count > buy_count:
-    #     return "Sell"
-    # else:
-    #     return None  # No clear majority   
+    # Decide buy or sell based on the majority
+    if buy_count > sell_count:
+        return "buy"
+    elif sell_count > buy_count:
+        return "sell"
+    return None  # No clear majority
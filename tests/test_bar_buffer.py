@@ -0,0 +1,81 @@
+"""Tests of shared.bar_buffer"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from shared.bar_buffer import BarBuffer, LOCAL_TZ
+
+
+###############################################################################
+def local_dates(epochs) -> np.ndarray:
+    """Expected naive local datetimes of epoch seconds."""
+    return (pd.to_datetime(np.asarray(epochs, dtype=np.int64), unit='s', utc=True)
+            .tz_convert(LOCAL_TZ).tz_localize(None).to_numpy())
+
+
+###############################################################################
+class TestBarBuffer(unittest.TestCase):
+
+    ###########################################################################
+    def test_append_and_take(self):
+        buffer = BarBuffer(capacity=2)
+        for i in range(5):  # grows twice
+            buffer.append(str(1700000000 + 60 * i), 1.0 + i, 2.0 + i,
+                          0.5 + i, 1.5 + i, 100.7 + i)
+        self.assertEqual(len(buffer), 5)
+
+        bars = buffer.take()
+        self.assertEqual(len(buffer), 0)
+        np.testing.assert_array_equal(
+            bars['date'], local_dates([1700000000 + 60 * i for i in range(5)]))
+        np.testing.assert_array_equal(bars['open'], [1.0, 2.0, 3.0, 4.0, 5.0])
+        np.testing.assert_array_equal(bars['close'], [1.5, 2.5, 3.5, 4.5, 5.5])
+        # Volumes are truncated to int64
+        self.assertEqual(bars['volume'].dtype, np.int64)
+        np.testing.assert_array_equal(bars['volume'], [100, 101, 102, 103, 104])
+
+    ###########################################################################
+    def test_zero_capacity_grows(self):
+        buffer = BarBuffer(capacity=0)
+        buffer.append(1700000000, 1.0, 1.0, 1.0, 1.0, 1.0)
+        self.assertEqual(len(buffer), 1)
+
+        buffer = BarBuffer(capacity=0)
+        ones = np.ones(3)
+        buffer.extend(np.array([1, 2, 3]), ones, ones, ones, ones, ones)
+        self.assertEqual(len(buffer), 3)
+
+    ###########################################################################
+    def test_extend_after_append(self):
+        buffer = BarBuffer(capacity=1)
+        buffer.append(1700000000, 1.0, 1.0, 1.0, 1.0, 10.0)
+        closes = np.array([2.0, 3.0, 4.0])
+        buffer.extend(np.array([1700000060, 1700000120, 1700000180]),
+                      closes, closes, closes, closes, np.array([20.0, 30.0, 40.0]))
+
+        bars = buffer.take()
+        np.testing.assert_array_equal(bars['close'], [1.0, 2.0, 3.0, 4.0])
+        np.testing.assert_array_equal(bars['volume'], [10, 20, 30, 40])
+        np.testing.assert_array_equal(
+            bars['date'], local_dates([1700000000, 1700000060, 1700000120, 1700000180]))
+
+    ###########################################################################
+    def test_take_returns_copies(self):
+        buffer = BarBuffer(capacity=4)
+        buffer.append(1700000000, 1.0, 1.0, 1.0, 1.0, 1.0)
+        bars = buffer.take()
+        # The buffer arrays are reused by the next bars
+        buffer.append(1700000060, 9.0, 9.0, 9.0, 9.0, 9.0)
+        self.assertEqual(bars['close'][0], 1.0)
+
+    ###########################################################################
+    def test_clear(self):
+        buffer = BarBuffer()
+        buffer.append(1700000000, 1.0, 1.0, 1.0, 1.0, 1.0)
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(len(buffer.take()['close']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
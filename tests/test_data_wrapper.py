@@ -0,0 +1,84 @@
+"""Tests of ib_client.data_wrapper, skipped when ibapi is not installed"""
+import unittest
+
+import numpy as np
+
+try:
+    import ibapi  # noqa: F401
+except ImportError:
+    ibapi = None
+
+if ibapi is not None:
+    from ib_client.data_wrapper import DataWrapper
+    from shared.queue_manager import data_queue
+
+
+###############################################################################
+class ChartHandlerStub:
+    """Records the spinner state set by the wrapper."""
+
+    def __init__(self):
+        self.spinner = None
+
+    def set_spinner(self, on: bool):
+        self.spinner = on
+
+
+###############################################################################
+@unittest.skipIf(ibapi is None, "ibapi is not installed")
+class TestDataWrapper(unittest.TestCase):
+
+    ###########################################################################
+    def setUp(self):
+        data_queue.clear()
+        self.wrapper = DataWrapper()
+        self.chart_handler = ChartHandlerStub()
+        self.wrapper.set_chart_handler(self.chart_handler)
+
+    ###########################################################################
+    def bars(self, count: int) -> dict:
+        ones = np.ones(count)
+        return {'time': np.arange(1700000000, 1700000000 + 60 * count, 60),
+                'open': ones, 'high': ones, 'low': ones, 'close': ones,
+                'volume': ones}
+
+    ###########################################################################
+    def test_bars_are_queued_with_their_request(self):
+        event = self.wrapper.expect_historical_data(1, ('AAPL', '1 min'))
+        self.wrapper.historicalDataBars(1, self.bars(3))
+        self.wrapper.historicalDataEnd(1, '', '')
+
+        self.assertTrue(event.is_set())
+        (data_key, bars), = data_queue.drain()
+        self.assertEqual(data_key, ('AAPL', '1 min'))
+        self.assertEqual(len(bars['close']), 3)
+        self.assertEqual(self.wrapper.historical_data_events, {})
+        self.assertEqual(self.wrapper.historical_data_keys, {})
+
+    ###########################################################################
+    def test_no_bars(self):
+        event = self.wrapper.expect_historical_data(1, ('AAPL', '1 min'))
+        self.wrapper.historicalDataEnd(1, '', '')
+
+        self.assertTrue(event.is_set())
+        self.assertIs(self.chart_handler.spinner, False)
+        self.assertEqual(data_queue.drain(), [])
+
+    ###########################################################################
+    def test_failed_request_discards_its_bars(self):
+        event = self.wrapper.expect_historical_data(1, ('AAPL', '1 min'))
+        self.wrapper.historicalDataBars(1, self.bars(2))
+        self.wrapper.historical_data_failed(1)
+
+        self.assertTrue(event.is_set())
+        self.assertIs(self.chart_handler.spinner, False)
+        self.assertEqual(len(self.wrapper.bar_buffer), 0)
+        # Late bars of the request are not queued
+        self.wrapper.historicalDataBars(1, self.bars(2))
+        self.wrapper.historicalDataEnd(1, '', '')
+        self.assertEqual(data_queue.drain(), [])
+        self.assertEqual(len(self.wrapper.bar_buffer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Tests of chart_handler._kernels"""
+import unittest
+import numpy as np
+
+from chart_handler import _kernels
+from chart_handler._kernels import rolling_smas
+
+
+###############################################################################
+def naive_sma(close: np.ndarray, period: int) -> np.ndarray:
+    """SMA computed window by window."""
+    out = np.full(close.shape[0], np.nan)
+    for i in range(period - 1, close.shape[0]):
+        out[i] = close[i - period + 1:i + 1].mean()
+    return out
+
+
+###############################################################################
+class TestRollingSmas(unittest.TestCase):
+
+    ###########################################################################
+    def test_matches_naive_sma(self):
+        close = np.random.default_rng(0).uniform(100.0, 200.0, 300)
+        smas = rolling_smas(close, (14, 50))
+        self.assertEqual(len(smas), 2)
+        for period, sma in zip((14, 50), smas):
+            np.testing.assert_allclose(sma, naive_sma(close, period),
+                                       rtol=1e-9, equal_nan=True)
+
+    ###########################################################################
+    def test_cumsum_fallback_matches_naive_sma(self):
+        # The fallback used when numba is not installed
+        close = np.random.default_rng(1).uniform(100.0, 200.0, 120)
+        sma, = _kernels._rolling_smas_cumsum(close, (20,))
+        np.testing.assert_allclose(sma, naive_sma(close, 20),
+                                   rtol=1e-9, equal_nan=True)
+
+    ###########################################################################
+    def test_not_enough_bars(self):
+        close = np.arange(5, dtype=np.float64)
+        sma, = rolling_smas(close, (10,))
+        self.assertTrue(np.isnan(sma).all())
+
+    ###########################################################################
+    def test_empty(self):
+        sma, = rolling_smas(np.empty(0), (3,))
+        self.assertEqual(sma.shape, (0,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests of shared.queue_manager"""
+import queue
+import threading
+import unittest
+
+from shared.queue_manager import DequeQueue, NotifiableDeque
+
+
+###############################################################################
+class TestNotifiableDeque(unittest.TestCase):
+
+    ###########################################################################
+    def test_append_drain(self):
+        items = NotifiableDeque()
+        items.append(1)
+        items.put(2)
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items.drain(), [1, 2])
+        self.assertEqual(len(items), 0)
+
+    ###########################################################################
+    def test_wait_consumes_notification(self):
+        items = NotifiableDeque()
+        self.assertFalse(items.wait(timeout=0.01))
+        items.append(1)
+        self.assertTrue(items.wait(timeout=0.01))
+        self.assertFalse(items.wait(timeout=0.01))
+        items.notify()
+        self.assertTrue(items.wait(timeout=0.01))
+
+    ###########################################################################
+    def test_clear(self):
+        items = NotifiableDeque()
+        items.append(1)
+        items.clear()
+        self.assertEqual(items.drain(), [])
+
+
+###############################################################################
+class TestDequeQueue(unittest.TestCase):
+
+    ###########################################################################
+    def test_get_raises_empty(self):
+        messages = DequeQueue()
+        self.assertTrue(messages.empty())
+        with self.assertRaises(queue.Empty):
+            messages.get(block=False)
+        with self.assertRaises(queue.Empty):
+            messages.get(timeout=0.01)
+
+    ###########################################################################
+    def test_producer_consumer_order(self):
+        messages = DequeQueue()
+        count = 10000
+
+        def produce():
+            for i in range(count):
+                messages.put(i)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        received = [messages.get(timeout=1) for _ in range(count)]
+        producer.join()
+        self.assertEqual(received, list(range(count)))
+        self.assertTrue(messages.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()